@@ -0,0 +1,180 @@
+"""
+Numba-compiled kernels for the Pool Adjacent Violators (PAV) algorithm and
+for Bayes error-rate evaluation.
+
+The isotonic regression loop is the stack-based, O(n) amortized variant
+used by sklearn.isotonic (see scikit-learn PR #6691), but here the sort,
+the PAV merge and the extraction of the solution bins are fused into one
+compiled function, so no intermediate n-sized arrays have to be rescanned
+with np.unique afterwards.
+"""
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True)
+def pav_fit(scores, labels):
+    """
+    Fits the PAV solution for the given scores and 0/1 labels.
+
+    The scores are sorted in increasing order, with ties broken such that
+    scores with label 1 sort before those with label 0 (equivalent to
+    np.lexsort((-labels,scores))). The PAV merge then finds the bins of the
+    monotone solution.
+
+    Returns:
+
+        p: (nbins,) posterior (fraction of label 1) in each bin
+        counts: (nbins,) number of scores in each bin
+        targets: (nbins,) number of label-1 scores in each bin
+        lo: (nbins,) position in the sorted order of each bin's smallest score
+        hi: (nbins,) position in the sorted order of each bin's largest score
+        ii: (n,) the sorting permutation of the scores
+    """
+    n = scores.size
+
+    # One stable sort on the scores only. Ties are then fixed up locally, so
+    # that label-1 entries come first within each run of equal scores. The
+    # result is identical to np.lexsort((-labels,scores)), but saves the
+    # second full sort pass, which only existed to break ties.
+    ii = np.argsort(scores, kind='mergesort')
+    i = 0
+    while i < n - 1:
+        if scores[ii[i]] != scores[ii[i + 1]]:
+            i += 1
+            continue
+        j = i + 2
+        while j < n and scores[ii[j]] == scores[ii[i]]:
+            j += 1
+        run = np.empty(j - i, dtype=np.int64)     # stable partition of the
+        k = 0                                     # tied run: label 1 first
+        for t in range(i, j):
+            if labels[ii[t]] == 1:
+                run[k] = ii[t]
+                k += 1
+        if 0 < k < j - i:
+            for t in range(i, j):
+                if labels[ii[t]] != 1:
+                    run[k] = ii[t]
+                    k += 1
+            ii[i:j] = run
+        i = j
+
+    # stack-based PAV on the sorted labels, with unit weights
+    y = np.empty(n)           # block sums of labels (i.e. target counts)
+    w = np.empty(n)           # block sizes
+    link = np.empty(n, dtype=np.int64)    # index of the last element in a
+                                          # block, stored at the block start
+                                          # (and vice versa, for backtracking)
+    for i in range(n):
+        y[i] = labels[ii[i]]
+        w[i] = 1.0
+        link[i] = i
+
+    i = 0
+    while i < n:
+        k = link[i] + 1
+        if k == n:
+            break
+        if y[i] * w[k] < y[k] * w[i]:     # means increase: no violation
+            i = k
+            continue
+        sum_y = y[i]
+        sum_w = w[i]
+        while True:
+            # merge the block starting at k into the block starting at i
+            prev_y = y[k]
+            prev_w = w[k]
+            sum_y += prev_y
+            sum_w += prev_w
+            k = link[k] + 1
+            if k == n or prev_y * w[k] < y[k] * prev_w:
+                y[i] = sum_y
+                w[i] = sum_w
+                link[i] = k - 1
+                link[k - 1] = i
+                if i > 0:
+                    i = link[i - 1]       # backtrack: previous block may now violate
+                break
+
+    # extract the solution bins in one forward pass
+    nbins = 0
+    i = 0
+    while i < n:
+        nbins += 1
+        i = link[i] + 1
+
+    p = np.empty(nbins)
+    counts = np.empty(nbins, dtype=np.int64)
+    targets = np.empty(nbins, dtype=np.int64)
+    lo = np.empty(nbins, dtype=np.int64)
+    hi = np.empty(nbins, dtype=np.int64)
+    i = 0
+    for b in range(nbins):
+        k = link[i]
+        p[b] = y[i] / w[i]
+        counts[b] = np.int64(w[i])
+        targets[b] = np.int64(np.rint(y[i]))
+        lo[b] = i
+        hi[b] = k
+        i = k + 1
+    return p, counts, targets, lo, hi, ii
+
+
+@njit(cache=True, parallel=True)
+def min_bayes_error_rate(Ptar, Pnon, pmiss, pfa):
+    """
+    For each operating point j, minimizes
+
+        Ptar[j]*pmiss[k] + Pnon[j]*pfa[k]
+
+    over the ROCCH vertices k. Returns the minima and their vertex
+    indices, without materializing the (m, n-vertices) error matrix. The
+    vertex arrays are small enough to stay in cache across operating
+    points, which are processed in parallel.
+    """
+    m = Ptar.size
+    n = pmiss.size
+    ber = np.empty(m)
+    jj = np.empty(m, dtype=np.int64)
+    for j in prange(m):
+        e_min = np.inf
+        k_min = 0
+        for k in range(n):
+            e = Ptar[j] * pmiss[k] + Pnon[j] * pfa[k]
+            if e < e_min:
+                e_min = e
+                k_min = k
+        ber[j] = e_min
+        jj[j] = k_min
+    return ber, jj
+
+
+@njit(cache=True, parallel=True)
+def score_bayes_error_rate(tar_sorted, non_sorted, thr):
+    """
+    Bayes error-rates of raw scores at the given Bayes thresholds,
+    thr = -prior_log_odds. The error counts at each threshold come from
+    independent binary searches into the pre-sorted target and non-target
+    scores, so the thresholds are processed in parallel and the sigmoid,
+    search and combination are fused, without intermediate D-sized
+    temporaries beyond the outputs.
+
+    Returns ber, Pmiss, Pfa.
+    """
+    D = thr.size
+    T = tar_sorted.size
+    N = non_sorted.size
+    ber = np.empty(D)
+    Pmiss = np.empty(D)
+    Pfa = np.empty(D)
+    for j in prange(D):
+        t = thr[j]
+        pm = np.searchsorted(tar_sorted, t) / T     # tar scores < thr
+        pf = 1.0 - np.searchsorted(non_sorted, t) / N    # non scores >= thr
+        ptar = 1.0 / (1.0 + np.exp(t))              # sigmoid(plo)
+        pnon = 1.0 / (1.0 + np.exp(-t))             # sigmoid(-plo)
+        Pmiss[j] = pm
+        Pfa[j] = pf
+        ber[j] = ptar * pm + pnon * pf
+    return ber, Pmiss, Pfa
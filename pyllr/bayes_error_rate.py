@@ -9,15 +9,14 @@ https://arxiv.org/abs/1304.2865
 """
 
 import numpy as np
-from scipy import stats
 from scipy.special import expit as sigmoid
 
 from .pav_rocch import PAV, ROCCH
+from ._pav_numba import score_bayes_error_rate
+from .utils import scoreslabels_2_tarnon
 
-def ordinalrank(x):
-    return stats.rankdata(x, method='ordinal')
-
-def fast_Bayes_error_rate(scores, labels, prior_log_odds, return_der_Pmiss_Pfa = False):
+def fast_Bayes_error_rate(scores, labels, prior_log_odds, return_der_Pmiss_Pfa = False,
+                          pav = None):
     """
     Returns the Bayes error-rate at one or more operating points, when the 
     given scores are treated as log-likelihood-ratios and used to make 
@@ -36,42 +35,51 @@ def fast_Bayes_error_rate(scores, labels, prior_log_odds, return_der_Pmiss_Pfa =
     
     The algortihm used here is typically faster than a naive implementation
     where each theshold is applied separately to all the scores. This algorithm
-    jointly sorts the scores and thresholds and computes the error-rates
-    from the resulting sorted ranks.
-    
-    """    
-    plo = prior_log_odds
+    sorts the scores of each class once and then finds the number of errors at
+    every threshold with a binary search. The searches at the different
+    thresholds are independent and run in a parallel numba kernel.
+
+    If a PAV object constructed from the same scores and labels is passed as
+    pav, its cached sorted per-class scores are consumed instead, so that
+    nothing has to be sorted here at all.
+
+    """
+    plo = np.asarray(prior_log_odds, dtype=np.float64)
     assert (np.diff(plo) >=0 ).all()  # plo must be sorted
     thr = -plo                        # Bayes threshold
 
-    tar = scores[labels==1]
-    non = scores[labels==0]
+    if pav is None:
+        tar, non = scoreslabels_2_tarnon(scores, labels)
+        tar, non = np.sort(tar), np.sort(non)
+    else:
+        tar, non = pav.tar_sorted, pav.non_sorted
 
     D = len(plo)                      # number of operating points
     T = len(tar)
     N = len(non)
     assert N + T > 0 < D
 
-    Ddownto1 = np.arange(D,0,-1)
+    ber, Pmiss, Pfa = score_bayes_error_rate(tar, non, thr)
 
-    rk = ordinalrank(np.concatenate((thr,tar)))
-    rkD = rk[:D]
-    Pmiss = ( rkD - Ddownto1 ) /  T
+    if not return_der_Pmiss_Pfa: return ber
 
-    rk = ordinalrank(np.concatenate((thr,non)))
-    rkD = rk[:D]
-    Pfa = ( N - rkD + Ddownto1 ) / N
-
-    Ptar = sigmoid(plo)
-    Pnon = sigmoid(thr)
+    # default error-rate, using prior only
+    der = default_error_rate(plo)
 
-    # Bayes error-rate
-    ber = Ptar * Pmiss + Pnon * Pfa
+    return ber, der, Pmiss, Pfa
 
-    # default error-rate, using prior only
-    der = np.minimum(Ptar,Pnon)
 
-    return (ber, der, Pmiss, Pfa) if return_der_Pmiss_Pfa else ber
+class SortedScores:
+    """
+    Holds the target and non-target scores of a score set in sorted order.
+    Pass an instance as the pav argument of fast_Bayes_error_rate to evaluate
+    the same score set repeatedly without re-sorting. (A PAV object serves
+    the same purpose, when one has been constructed anyway.)
+    """
+    def __init__(self, scores, labels):
+        tar, non = scoreslabels_2_tarnon(scores, labels)
+        self.tar_sorted = np.sort(tar)
+        self.non_sorted = np.sort(non)
 
 
 def default_error_rate(prior_log_odds):
@@ -92,7 +100,7 @@ def default_error_rate(prior_log_odds):
     """
     
     Ptar = sigmoid(prior_log_odds)
-    Pnon = sigmoid(-prior_log_odds)
+    Pnon = 1.0 - Ptar     # sigmoid(-prior_log_odds), reusing the expit pass
     return np.minimum(Ptar,Pnon)
     
 
@@ -104,9 +112,10 @@ def Bayes_error_rate_analysis(scores,labels,prior_log_odds):
     
     """
     plo = prior_log_odds
-    pav = ROCCH(PAV(scores,labels)).Bayes_error_rate(plo)
-    ber, der, Pmiss, Pfa = fast_Bayes_error_rate(scores,labels,plo)
-    return pav, ber, der
+    pav = PAV(scores,labels)
+    opt = ROCCH(pav).Bayes_error_rate(plo)
+    ber, der, Pmiss, Pfa = fast_Bayes_error_rate(scores,labels,plo,True,pav=pav)
+    return opt, ber, der
 
 
      
@@ -1,5 +1,5 @@
 import numpy as np
-from scipy.special import logit
+from scipy.special import logit, expit, log_expit
 
 from pyllr.utils import softplus
 
@@ -7,13 +7,24 @@ log2 = np.log(2)
 
 def cross_entropy(tar,non,Ptar=0.5,deriv=False):
     logitprior = logit(Ptar)
-    if not deriv:
-        t = np.mean(softplus(-tar-logitprior))
-        n = np.mean(softplus(non+logitprior))
-        return ( Ptar*t  + (1-Ptar)*n ) / log2
-    
-    t, back1 = softplus(-tar-logitprior,deriv=True)
-    n, back2 = softplus(non+logitprior,deriv=True)
+    if np.iscomplexobj(tar) or np.iscomplexobj(non):
+        # complex-step friendly path
+        if not deriv:
+            t = np.mean(softplus(-tar-logitprior))
+            n = np.mean(softplus(non+logitprior))
+            return ( Ptar*t  + (1-Ptar)*n ) / log2
+        t, back1 = softplus(-tar-logitprior,deriv=True)
+        n, back2 = softplus(non+logitprior,deriv=True)
+    else:
+        # softplus(-z) = -log_expit(z), computed in a single stable C pass
+        if not deriv:
+            t = -np.mean(log_expit(tar+logitprior))
+            n = -np.mean(log_expit(-non-logitprior))
+            return ( Ptar*t  + (1-Ptar)*n ) / log2
+        t = -log_expit(tar+logitprior)
+        n = -log_expit(-non-logitprior)
+        back1 = lambda d: d*expit(-tar-logitprior)
+        back2 = lambda d: d*expit(non+logitprior)
     k1 = Ptar/(len(t)*log2)
     k2 = (1-Ptar)/(len(n)*log2)
     y = k1*t.sum()  + k2*n.sum()
@@ -30,14 +41,16 @@ def cllr(tar,non,deriv=False):
     
 def min_cllr(pav):
     llrs, tar_counts, non_counts = pav.llrs()
-    tnz = tar_counts > 0  # avoid 0 * inf
-    nnz = non_counts > 0
-    T = tar_counts.sum()    
+    T = tar_counts.sum()
     N = non_counts.sum()
-    tar_costs = softplus(-llrs)    
+    # The end bins may have llr = +-inf, but only where the corresponding
+    # count is 0. Clipping keeps the costs finite there, so that those bins
+    # contribute 0 (not 0*inf) and the dot products can run unmasked.
+    llrs = np.clip(llrs, -745.0, 745.0)
+    tar_costs = softplus(-llrs)
     non_costs = softplus(llrs)
-    return ( (tar_costs[tnz] @ tar_counts[tnz]) / T \
-            + (non_costs[nnz] @ non_counts[nnz]) / N ) / (2*log2)
+    return ( (tar_costs @ tar_counts) / T \
+            + (non_costs @ non_counts) / N ) / (2*log2)
 
 
     
@@ -2,8 +2,9 @@
 Module lib.calibration.pav_rocch
 
 This module provides a fast (for Python) Pool Adjacent Violators PAV algorithm
-implementation. The basic algorithm is invoked in sklearn.isotonic, although we 
-peeled off a layer of pre- and post-processing that we don't need.
+implementation. The basic algorithm is the same one invoked in sklearn.isotonic,
+but here the sort, merge and bin extraction run in a single numba-compiled
+kernel (see _pav_numba), without the pre- and post-processing that we don't need.
 
 The PAV algorithm provides an optimal score-to-posterior, or score-to-log-
 likelihood-ratio transformation, where the scores are possibly uncalibrated 
@@ -13,12 +14,11 @@ hull (ROCCH), which provides further score analysis tools.
 
 """
 import numpy as np
-from sklearn._isotonic import _inplace_contiguous_isotonic_regression as fastpav
-
 
 from scipy.special import expit as sigmoid
 from scipy.special import logit
-from scipy.optimize import minimize_scalar
+
+from ._pav_numba import pav_fit, min_bayes_error_rate
 
 
 class PAV:
@@ -47,28 +47,28 @@ class PAV:
         self.T = T = labels.sum()
         self.N = N = len(labels) - self.T
         assert T > 0 < N
-        
-        ii = np.lexsort((-labels,scores))  # when scores are equal, those with 
-                                           # label 1 are considered inferior
-        weights = np.ones_like(scores, dtype=np.float64)
-        y = np.empty_like(scores, dtype=np.float64)
-        y[:] = labels[ii]
-        fastpav(y,weights)
-
-        p, ff, counts = np.unique(y, return_index = True, return_counts = True)
+
+        p, counts, targets, lo, hi, ii = pav_fit(
+            np.asarray(scores, dtype=np.float64),
+            np.asarray(labels, dtype=np.int8))
+        # stash the per-class scores in sorted order, for consumers like
+        # fast_Bayes_error_rate that would otherwise have to sort again
+        sorted_scores = scores[ii]
+        tt = labels[ii] == 1
+        self.tar_sorted = sorted_scores[tt]
+        self.non_sorted = sorted_scores[~tt]
         self.nbins = len(p)
         self.p = p
         self.counts = counts
-        self.scores = np.empty((self.nbins,2))
-        self.scores[:,0] = scores[ii[ff]]            # bin low scores
-        self.scores[:,1] = scores[ii[ff+counts-1]]   # bin high scores
-        
-        self.targets = np.rint(counts * p).astype(int)    # number of target scores in each PAV block    
-        self.nontars = counts - self.targets              # number of non-tar scores in each PAV block
+        self.scores_lo = np.asarray(sorted_scores[lo], dtype=np.float64)  # bin low scores
+        self.scores_hi = np.asarray(sorted_scores[hi], dtype=np.float64)  # bin high scores
+
+        self.targets = targets                       # number of target scores in each PAV block
+        self.nontars = counts - targets              # number of non-tar scores in each PAV block
         assert self.targets.sum() == T
         assert self.nontars.sum() == N
         
-    def rocch(self, asmatrix = False):
+    def rocch(self, asmatrix = False, out = None):
         """
         This returns the convex hull of the ROC (receiver operating curve)
         associated with the scores and labels that were used to construct this 
@@ -78,15 +78,23 @@ class PAV:
         last at (1,0). There are always at least two vertices. The vertices 
         describe a convex, piece-wise linear curve. 
         
-        The result can be retuned as a (2,n-vertices) matrix, or Pmiss and 
+        The result can be retuned as a (2,n-vertices) matrix, or Pmiss and
         Pfa can be returned separately, according to the asmatrix flag.
-        
-        The user does not typically have to invoke this call. Instead the user 
+
+        A caller that invokes this method repeatedly can pass a preallocated
+        (2, nbins+1) array as out, which is then filled in place and returned,
+        avoiding a fresh allocation per call.
+
+        The user does not typically have to invoke this call. Instead the user
         would do my_rocch = ROCCH(PAV(scores,labels)) and then call some methods
         on my_rocch.
         """
         nbins = self.nbins
-        PmissPfa = np.empty((2,nbins+1)) 
+        if out is None:
+            out = np.empty((2,nbins+1))
+        else:
+            assert out.shape == (2,nbins+1)
+        PmissPfa = out
         pmiss = PmissPfa[0,:]
         pfa = PmissPfa[1,:]
         pmiss[0] = 0.0
@@ -124,13 +132,15 @@ class PAV:
         The initial and final llr bins may be -inf and +inf.
         
         """
-        p = self.p
-        LLRs = np.empty_like(self.scores)
-        llr = LLRs[:,0]
-        llr[:] = logit(p)
-        llr -= np.log(self.T / self.N)   
-        LLRs[:,1] = llr 
-        return self.scores.ravel(), LLRs.ravel()
+        nbins = self.nbins
+        sc = np.empty(2*nbins)
+        sc[0::2] = self.scores_lo
+        sc[1::2] = self.scores_hi
+        llr = logit(self.p) - np.log(self.T / self.N)
+        llrs = np.empty(2*nbins)
+        llrs[0::2] = llr
+        llrs[1::2] = llr
+        return sc, llrs
 
 
 class ROCCH:
@@ -156,13 +166,8 @@ class ROCCH:
         """
         pmiss = self.PmissPfa[0,:]     # increasing
         pfa = self.PmissPfa[1,:]       # decreasing
-        n = len(pmiss)-1               # number of segments
-        sum = 0.0
-        for i in range(n):
-            delta_x = pfa[i] - pfa[i+1]
-            avg_y = (pmiss[i] + pmiss[i+1]) / 2
-            sum += delta_x * avg_y
-        return sum    
+        # trapezium rule over the segments, as a single dot product
+        return 0.5 * np.dot(pfa[:-1] - pfa[1:], pmiss[:-1] + pmiss[1:])
             
 
     def Pmiss_Pfa(self):
@@ -197,16 +202,13 @@ class ROCCH:
             
         """
         sc = np.isscalar(prior_log_odds)
-        m = 1 if sc else len(prior_log_odds)
-        PP = np.empty((2,m))
-        PP[0,:] = sigmoid(prior_log_odds)
-        PP[1,:] = sigmoid(-prior_log_odds)
-        E = PP.T @ self.PmissPfa              # (m,nbins+1)
+        plo = np.atleast_1d(np.asarray(prior_log_odds, dtype=np.float64))
+        Ptar = sigmoid(plo)
+        Pnon = 1.0 - Ptar          # sigmoid(-plo), without a second expit pass
+        ber, jj = min_bayes_error_rate(Ptar, Pnon,
+                                       self.PmissPfa[0,:], self.PmissPfa[1,:])
         if not return_Pmiss_Pfa:
-            ber = E.min(axis=1)
             return ber.item() if sc else ber
-        jj = E.argmin(axis=1)
-        ber = E[range(len(jj)),jj]
         Pmiss = self.PmissPfa[0,jj]
         Pfa = self.PmissPfa[1,jj]
         if sc: ber, Pmiss, Pfa = ber.item(), Pmiss.item(), Pfa.item() 
@@ -219,9 +221,14 @@ class ROCCH:
            this curve, when maximized w.r.t. the operating point. 
         
         """
-        f = lambda x: -self.Bayes_error_rate(x)
-        res = minimize_scalar(f)
-        return -f(res.x)
+        pmiss = self.PmissPfa[0,:]     # increasing, from 0
+        pfa = self.PmissPfa[1,:]       # decreasing, to 0
+        d = pmiss - pfa                # non-decreasing, from -1 to 1
+        j = np.searchsorted(d, 0.0)    # first vertex with pmiss >= pfa
+        if d[j] == 0.0: return pmiss[j]
+        # interpolate on the crossing segment (j-1, j)
+        t = -d[j-1] / (d[j] - d[j-1])
+        return pmiss[j-1] + t * (pmiss[j] - pmiss[j-1])
         
 
 
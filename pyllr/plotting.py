@@ -7,14 +7,26 @@ of probabilistic binary classifiers.
 """
 import numpy as np
 
-import matplotlib.pyplot as plt
 from scipy.special import expit as sigmoid
 
 from .pav_rocch import PAV, ROCCH
-from .bayes_error_rate import default_error_rate, fast_Bayes_error_rate
+from .bayes_error_rate import default_error_rate, fast_Bayes_error_rate, \
+                              SortedScores
 
 from .utils import probit
 
+# DET axis annotations are fixed, so their probit-warped positions are
+# computed once here rather than per DETPlot instance
+_DET_XTICKS = np.array([1e-5,1e-4,1e-3,2e-3,5e-3,1e-2,2e-2,5e-2,1e-1,2e-1,4e-1])
+_DET_XTICKLABELS = ['0.001',' 0.01','  0.1','  0.2','  0.5','    1','    2','    5','   10','   20','   40']
+_DET_YTICKS = np.array([1e-3,2e-3,5e-3,1e-2,2e-2,5e-2,1e-1,2e-1,4e-1,8e-1])
+_DET_YTICKLABELS = ['0.1','0.2','0.5',' 1 ',' 2 ',' 5 ',' 10',' 20',' 40',' 80']
+_DET_XTICKS_PROBIT = probit(_DET_XTICKS)
+_DET_YTICKS_PROBIT = probit(_DET_YTICKS)
+for _arr in (_DET_XTICKS, _DET_YTICKS, _DET_XTICKS_PROBIT, _DET_YTICKS_PROBIT):
+    _arr.setflags(write=False)
+
+
 class BayesErrorPlot:
     """
     This plot graphically analyzes the calibration of the outputs
@@ -35,7 +47,7 @@ class BayesErrorPlot:
     
     """
     
-    def __init__(self,axes,prior_log_odds,title=""):
+    def __init__(self,axes,prior_log_odds,title="",ymin=1e-4):
         """
         Initialize the plot, where:
 
@@ -50,7 +62,12 @@ class BayesErrorPlot:
                             to be log-likelihood-ratios) are compared to make 
                             decisions.
                             
-            title: string, optional  
+            title: string, optional
+
+            ymin: float (optional, default 1e-4). Error-rates are clipped
+                  below at this value before plotting, so that the log axis
+                  does not stretch over many invisible decades when some
+                  region of the curve is (near) perfectly separated.
 
               
             This initialization automatically adds the graph of the default 
@@ -64,7 +81,10 @@ class BayesErrorPlot:
         """
         self.axes = ax = axes
         self.plo = plo = prior_log_odds
-        ax.semilogy(plo,default_error_rate(plo),'k-',label=r'$\min(\pi,1-\pi)$')
+        self.ymin = ymin
+        self._cache = {}     # sorted per-class scores, keyed per score set
+        ax.semilogy(plo,self._clip(default_error_rate(plo)),'k-',
+                    label=r'$\min(\pi,1-\pi)$')
         if len(title)>0: ax.set_title(title)
         #ax.set_xlabel(r'$\textrm{logit} $P_{tar}=-\textrm{threshold}$')
         ax.set_xlabel(r'$\log\frac{\pi}{1-\pi}$')
@@ -72,6 +92,11 @@ class BayesErrorPlot:
         ax.grid()
 
 
+    def _clip(self,ber):
+        """clip (in-place) to the visible range of the log axis"""
+        return np.clip(ber, self.ymin, 1.0, out=ber)
+
+
 
     def add_pav(self,scores,labels,plotformat='k--',plotlabel="PAV-optimal",**kwargs):
         """
@@ -117,8 +142,11 @@ class BayesErrorPlot:
         """
         ax, plo = self.axes, self.plo
         self.pav = pav = PAV(scores,labels)
-        self.rocch = rocch = ROCCH(pav) 
-        ber = rocch.Bayes_error_rate(plo)
+        # re-usable by add(); the arrays are kept in the entry so that a
+        # stale id() key can never match different data
+        self._cache[(id(scores),id(labels))] = (scores, labels, pav)
+        self.rocch = rocch = ROCCH(pav)
+        ber = self._clip(rocch.Bayes_error_rate(plo))
         ax.semilogy(plo,ber,plotformat,label=plotlabel,**kwargs)
         return pav, rocch
     
@@ -157,7 +185,14 @@ class BayesErrorPlot:
                     
         """
         ax, plo = self.axes, self.plo
-        ber = fast_Bayes_error_rate(scores, labels, plo) 
+        key = (id(scores),id(labels))
+        hit = self._cache.get(key)
+        if hit is not None and hit[0] is scores and hit[1] is labels:
+            sorted_scores = hit[2]
+        else:
+            sorted_scores = SortedScores(scores, labels)
+            self._cache[key] = (scores, labels, sorted_scores)
+        ber = self._clip(fast_Bayes_error_rate(scores, labels, plo, pav=sorted_scores))
         ax.semilogy(plo,ber,plotformat,label=plotlabel,**kwargs)
         
         
@@ -223,15 +258,18 @@ class TransformPlot:
         """
         limit = 5000
         n = len(scores)
-        if n > limit:
-            ii = np.random.choice(n,limit,replace=False)
-            scores = scores[ii]
-            llrs = llrs[ii]
-        
         ax = self.axes
         if sortscores:
             ii = np.argsort(scores)
             scores, llrs = scores[ii], llrs[ii]
+            if n > limit:
+                # sorted: evenly strided subsample plots the same curve
+                ii = np.linspace(0, n-1, limit).astype(np.intp)
+                scores, llrs = scores[ii], llrs[ii]
+        elif n > limit:
+            rng = np.random.default_rng(0)
+            ii = rng.choice(n, limit, replace=False, shuffle=False)
+            scores, llrs = scores[ii], llrs[ii]
         ax.plot(scores,llrs,plotformat,label=plotlabel,**kwargs)
         
         
@@ -278,21 +316,17 @@ class DETPlot:
         
         # pfa_limits = probit(np.array([3e-6,5e-1]))
         # pmiss_limits = probit(np.array([3e-4,9e-1]))
-        xticks = np.array([1e-5,1e-4,1e-3,2e-3,5e-3,1e-2,2e-2,5e-2,1e-1,2e-1,4e-1])
-        xticklabels = ['0.001',' 0.01','  0.1','  0.2','  0.5','    1','    2','    5','   10','   20','   40']
-        yticks = np.array([1e-3,2e-3,5e-3,1e-2,2e-2,5e-2,1e-1,2e-1,4e-1,8e-1])
-        yticklabels = ['0.1','0.2','0.5',' 1 ',' 2 ',' 5 ',' 10',' 20',' 40',' 80']
-    
+
         #ax.set_xlim(*pfa_limits)
         #ax.set_ylim(*pmiss_limits)
         #ax.set_box_aspect(1)
         ax.set_aspect("equal")
-        
-        
-        ax.set_xticks(probit(xticks))
-        ax.set_xticklabels(xticklabels)
-        ax.set_yticks(probit(yticks))
-        ax.set_yticklabels(yticklabels)
+
+
+        ax.set_xticks(_DET_XTICKS_PROBIT)
+        ax.set_xticklabels(_DET_XTICKLABELS)
+        ax.set_yticks(_DET_YTICKS_PROBIT)
+        ax.set_yticklabels(_DET_YTICKLABELS)
         ax.grid()
 
         
@@ -306,9 +340,20 @@ class DETPlot:
         
 def tarnon_hist(tar,non,axes,title=None,tbins=None,nbins=None):
     if title is None: title = "score histogram"
-    if tbins is None: tbins = max(20,min(200,int(len(tar)/20)))    
-    if nbins is None: nbins = max(20,min(200,int(len(non)/20)))    
-    axes.hist(non,bins=nbins,density=True)
-    axes.hist(tar,bins=tbins,density=True,alpha=0.8)
+    lo = min(tar.min(), non.min())
+    hi = max(tar.max(), non.max())
+    if tbins is None and nbins is None:
+        # shared edges over the joint support: both classes are binned with
+        # the same widths, so the two densities are visually comparable
+        edges = np.histogram_bin_edges(np.concatenate((tar,non)), bins='auto',
+                                       range=(lo,hi))
+        tedges = nedges = edges
+    else:
+        if tbins is None: tbins = max(20,min(200,int(len(tar)/20)))
+        if nbins is None: nbins = max(20,min(200,int(len(non)/20)))
+        tedges = np.histogram_bin_edges(tar, bins=tbins, range=(lo,hi))
+        nedges = np.histogram_bin_edges(non, bins=nbins, range=(lo,hi))
+    axes.hist(non,bins=nedges,density=True)
+    axes.hist(tar,bins=tedges,density=True,alpha=0.8)
     axes.set_title(title)
     axes.legend(["non","tar"])
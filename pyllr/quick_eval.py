@@ -1,7 +1,25 @@
 import numpy as np
+from scipy.special import ndtr, ndtri
 from pyllr.pav_rocch import PAV, ROCCH
 from pyllr.cllr import cllr, min_cllr
-from pyllr.utils import tarnon_2_scoreslabels, scoreslabels_2_tarnon, probit, probitinv
+from pyllr.utils import tarnon_2_scoreslabels, scoreslabels_2_tarnon, sqrt2
+
+_core_cache = [None]     # (scores, labels, pav, rocch) of the most recent call
+
+def _core(scores, labels):
+    """
+    Builds PAV(scores,labels) and its ROCCH, memoizing the most recent score
+    set (by identity), so that the wrappers in this module never construct
+    the same PAV twice — neither within one combined-metric call, nor across
+    repeated calls on the same arrays.
+    """
+    hit = _core_cache[0]
+    if hit is not None and hit[0] is scores and hit[1] is labels:
+        return hit[2], hit[3]
+    pav = PAV(scores,labels)
+    rocch = ROCCH(pav)
+    _core_cache[0] = (scores, labels, pav, rocch)
+    return pav, rocch
 
 def scoreslabels_2_eer_cllr_mincllr(scores, labels):
     """
@@ -32,8 +50,8 @@ def scoreslabels_2_eer_cllr_mincllr(scores, labels):
                         usign the given labels. 
     
     """
-    pav = PAV(scores,labels)
-    eer = ROCCH(pav).EER()
+    pav, rocch = _core(scores,labels)
+    eer = rocch.EER()
     Cllr = cllr(*scoreslabels_2_tarnon(scores, labels))
     minCllr = min_cllr(pav)
     return eer, Cllr, minCllr
@@ -73,8 +91,8 @@ def tarnon_2_eer_cllr_mincllr(tar, non):
     
     
     scores, labels =  tarnon_2_scoreslabels(tar, non)
-    pav = PAV(scores,labels)
-    eer = ROCCH(pav).EER()
+    pav, rocch = _core(scores,labels)
+    eer = rocch.EER()
     Cllr = cllr(tar, non)
     minCllr = min_cllr(pav)
     return eer, Cllr, minCllr
@@ -99,8 +117,8 @@ def tarnon_2_eer(tar,non):
     
     """
 
-    pav = PAV(*tarnon_2_scoreslabels(tar,non))
-    return ROCCH(pav).EER()
+    pav, rocch = _core(*tarnon_2_scoreslabels(tar,non))
+    return rocch.EER()
 
 
     
@@ -123,19 +141,18 @@ def scoreslabels_2_eer(scores,labels):
         EER: float. Equal-Error-Rate. This is the ROCCH-EER. 
     
     """
-    pav = PAV(scores,labels)
-    return ROCCH(pav).EER()
+    pav, rocch = _core(scores,labels)
+    return rocch.EER()
 
 
 
 
 def tarnon_2_auc(tar,non):
-    pav = PAV(*tarnon_2_scoreslabels(tar,non))
-    return ROCCH(pav).AUC()
+    pav, rocch = _core(*tarnon_2_scoreslabels(tar,non))
+    return rocch.AUC()
 
 def tarnon_2_eer_auc(tar,non):
-    pav = PAV(*tarnon_2_scoreslabels(tar,non))
-    rocch = ROCCH(pav)
+    pav, rocch = _core(*tarnon_2_scoreslabels(tar,non))
     return rocch.EER(), rocch.AUC()
 
 def eer_2_auc_approx(eer):
@@ -146,6 +163,6 @@ def eer_2_auc_approx(eer):
     approximately Gaussian and when targets and non-targets have approximately
     equal variances.
     """
-    return probitinv(np.sqrt(2)*probit(eer))
+    return ndtr(sqrt2*ndtri(eer))
 
 
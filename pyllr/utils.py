@@ -1,8 +1,33 @@
 
 import numpy as np
-from scipy.special import erf, erfinv, expit
+from numba import njit, prange
+from scipy.special import expit, ndtr, ndtri
 
-sqrt2 = np.sqrt(2)
+sqrt2 = 1.4142135623730951    # float(np.sqrt(2)), as a plain Python float
+
+
+@njit(cache=True, parallel=True, fastmath=True)
+def _sigmoid_real(x):
+    y = np.empty_like(x)
+    for i in prange(x.size):
+        y[i] = 1.0 / (1.0 + np.exp(-x[i]))
+    return y
+
+
+@njit(cache=True, parallel=True, fastmath=True)
+def _softplus_real(x):
+    y = np.empty_like(x)
+    for i in prange(x.size):
+        xi = x[i]
+        a = xi if xi < 0.0 else -xi               # -abs(xi)
+        m = xi if xi > 0.0 else 0.0               # max(xi,0)
+        y[i] = np.log1p(np.exp(a)) + m
+    return y
+
+
+def _jittable(x):
+    """the elementwise numba kernels handle this input"""
+    return isinstance(x, np.ndarray) and x.ndim == 1 and x.dtype == np.float64
 
 def tarnon_2_scoreslabels(tar,non):
     """
@@ -13,28 +38,31 @@ def tarnon_2_scoreslabels(tar,non):
     Returns scores, labels
     """
     scores = np.concatenate((tar,non))
-    labels = np.zeros_like(scores,dtype=int)
-    labels[:len(tar)] = 1.0
+    labels = np.empty(len(scores),dtype=np.int8)
+    labels[:len(tar)] = 1
+    labels[len(tar):] = 0
     return scores, labels
 
 def scoreslabels_2_tarnon(scores,labels):
     """
     Splits the given scores vector according to the vector of binary labels.
-    Labels for tar scores should equate to 1 (e.g. 1 or 1.0 or True) and
-    everything else is considered non scores.
-    
+    Labels for tar scores should be nonzero (e.g. 1 or 1.0 or True) and zero
+    labels are considered non scores.
+
     Return tar, non
     """
-    tt = labels==1
-    tar = scores[tt]
-    non = scores[np.logical_not(tt)]
-    return tar, non    
+    tt = labels.astype(bool, copy=False)   # no copy for bool/int8 labels
+    return scores[tt], scores[~tt]
 
-def probit(p):
-    return sqrt2*erfinv(2.0*p - 1.0)
+def probit(p, out=None):
+    """= sqrt2*erfinv(2p-1), in one specialized ufunc. An output buffer may
+       be passed as out (which may be p itself, for in-place operation)."""
+    return ndtri(p, out=out)
 
-def probitinv(x):
-    return (1.0 + erf(x/sqrt2) ) / 2.0
+def probitinv(x, out=None):
+    """= (1+erf(x/sqrt2))/2, in one specialized ufunc. An output buffer may
+       be passed as out (which may be x itself, for in-place operation)."""
+    return ndtr(x, out=out)
 
 
 def eer_2_dprime(eer):
@@ -42,17 +70,28 @@ def eer_2_dprime(eer):
 
 def cs_sigmoid(x):
     """numerically stable and complex-step-friendly version of sigmoid"""
-    if not np.iscomplexobj(x): return expit(x)
+    if not np.iscomplexobj(x):
+        if _jittable(x): return _sigmoid_real(np.ascontiguousarray(x))
+        return expit(x)
     rx = np.real(x)
-    p, q = expit(rx), expit(-rx)
+    p = expit(rx)
+    q = 1.0 - p       # = expit(-rx), reusing the exp already paid for p
     return p + 1.0j*p*q*np.imag(x)
 
 def sigmoid(x,deriv=False):
-    p = cs_sigmoid(x)
+    if np.iscomplexobj(x):
+        p = cs_sigmoid(x)
+        if not deriv: return p
+
+        q = cs_sigmoid(-x)
+        def back(dp): return dp*p*q
+        return p, back
+
+    # real fast path: no complex-check dispatch in cs_sigmoid
+    p = _sigmoid_real(np.ascontiguousarray(x)) if _jittable(x) else expit(x)
     if not deriv: return p
-    
-    q = cs_sigmoid(-x)
-    def back(dp): return dp*p*q
+
+    def back(dp): return dp*p*(1.0-p)
     return p, back
     
     
@@ -62,7 +101,8 @@ def cs_softplus(x):
        
        softplus = log( 1 + exp(x) )
     """
-    if not np.iscomplexobj(x): 
+    if not np.iscomplexobj(x):
+        if _jittable(x): return _softplus_real(np.ascontiguousarray(x))
         return np.log1p(np.exp(-np.abs(x))) + np.maximum(x, 0)
     #return np.log( 1 + np.exp(x) )
     rx = np.real(x)
@@ -71,9 +111,20 @@ def cs_softplus(x):
 
 
 def softplus(x, deriv=False):
-    y = cs_softplus(x)
-    if not deriv: return y
-    
-    dydx = cs_sigmoid(x)
+    if np.iscomplexobj(x):
+        y = cs_softplus(x)
+        if not deriv: return y
+
+        dydx = cs_sigmoid(x)
+        def back(dy): return dy*dydx
+        return y, back
+
+    if not deriv: return cs_softplus(x)      # fused numba kernel when possible
+
+    # real case with deriv: one exp serves both the value and the derivative
+    e = np.exp(-np.abs(x))
+    y = np.log1p(e) + np.maximum(x, 0)
+
+    dydx = np.where(x >= 0, 1.0, e) / (1.0 + e)   # = sigmoid(x)
     def back(dy): return dy*dydx
-    return y, back 
+    return y, back